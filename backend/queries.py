@@ -0,0 +1,230 @@
+"""Prepared statements for the hot article queries.
+
+Every filter/sort combination of the article SELECTs is defined once here.
+Statements are prepared lazily, once per pooled connection, and afterwards
+run with EXECUTE so PostgreSQL skips parsing and planning on the hot path.
+"""
+import itertools
+import threading
+from collections import Counter
+
+import psycopg2.extensions
+
+
+class PreparedConnection(psycopg2.extensions.connection):
+    """Connection that remembers which statements it has already prepared"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements = set()
+
+
+class Statement:
+    """A named server-side prepared statement"""
+
+    def __init__(self, name, param_types, sql):
+        self.name = name
+        self.param_types = tuple(param_types)
+        self.sql = sql
+
+    @property
+    def prepare_sql(self):
+        if self.param_types:
+            return f"PREPARE {self.name} ({', '.join(self.param_types)}) AS {self.sql}"
+        return f"PREPARE {self.name} AS {self.sql}"
+
+    @property
+    def execute_sql(self):
+        if self.param_types:
+            placeholders = ", ".join(["%s"] * len(self.param_types))
+            return f"EXECUTE {self.name} ({placeholders})"
+        return f"EXECUTE {self.name}"
+
+
+ARTICLE_COLUMNS = """
+    a.id, a.title, a.thumbnail, a.is_video, a.total_view,
+    p.name as province_name, c.name as city_name,
+    a.tags_csv as tags, a.posting_date, cat.label as category
+"""
+
+TOTAL_DOWNLOAD_COLUMN = """
+    COALESCE((SELECT SUM(total_download) FROM "ArticleContentImage" WHERE id_article = a.id), 0) as total_download
+"""
+
+ARTICLE_JOINS = """
+    FROM "Article" a
+    LEFT JOIN "Province" p ON a.id_province = p.id
+    LEFT JOIN "City" c ON a.id_city = c.id
+    LEFT JOIN "Category" cat ON a.id_category = cat.id
+"""
+
+SORT_ORDERS = {
+    "recent": "a.posting_date DESC",
+    "popular": "a.total_view DESC",
+    "downloads": "total_download DESC",
+}
+
+# (key, parameter type, predicate) - "{0}" is replaced by the $n placeholder
+ARTICLE_FILTERS = (
+    ("province", "integer", "a.id_province = {0}"),
+    ("category", "integer", "a.id_category = {0}"),
+    ("video", "boolean", "a.is_video = {0}"),
+    ("search", "text", "(LOWER(a.title) LIKE LOWER({0}) OR LOWER(a.tags_csv) LIKE LOWER({0}))"),
+)
+
+AI_SEARCH_FILTERS = (
+    ("province", "text", "LOWER(p.name) LIKE LOWER({0})"),
+    ("category", "text", "LOWER(cat.label) LIKE LOWER({0})"),
+    ("video", "boolean", "a.is_video = {0}"),
+)
+
+
+def _combinations(filters):
+    """Yield every subset of the filter keys, in declaration order"""
+    keys = [key for key, _, _ in filters]
+    for size in range(len(keys) + 1):
+        yield from itertools.combinations(keys, size)
+
+
+def _where(filters, active):
+    """Build the WHERE clause and parameter types for the active filters"""
+    clauses = ["a.is_active = true"]
+    param_types = []
+    for key, param_type, predicate in filters:
+        if key in active:
+            param_types.append(param_type)
+            clauses.append(predicate.format(f"${len(param_types)}"))
+    return "WHERE " + " AND ".join(clauses), param_types
+
+
+def _name(prefix, active, *suffix):
+    return "_".join([prefix, *(active or ("all",)), *suffix])
+
+
+ARTICLE_LIST = {}
+ARTICLE_COUNT = {}
+for _active in _combinations(ARTICLE_FILTERS):
+    _where_sql, _types = _where(ARTICLE_FILTERS, _active)
+    ARTICLE_COUNT[_active] = Statement(
+        _name("article_count", _active),
+        _types,
+        f'SELECT COUNT(*) as total FROM "Article" a {_where_sql}',
+    )
+    for _sort, _order in SORT_ORDERS.items():
+        _limit = len(_types) + 1
+        ARTICLE_LIST[_active, _sort] = Statement(
+            _name("article_list", _active, _sort),
+            _types + ["bigint", "bigint"],
+            f"SELECT {ARTICLE_COLUMNS}, {TOTAL_DOWNLOAD_COLUMN} {ARTICLE_JOINS} {_where_sql} "
+            f"ORDER BY {_order} LIMIT ${_limit} OFFSET ${_limit + 1}",
+        )
+
+AI_SEARCH = {}
+for _active in _combinations(AI_SEARCH_FILTERS):
+    _where_sql, _types = _where(AI_SEARCH_FILTERS, _active)
+    AI_SEARCH[_active] = Statement(
+        _name("ai_search", _active),
+        _types,
+        f"SELECT {ARTICLE_COLUMNS} {ARTICLE_JOINS} {_where_sql} ORDER BY a.total_view DESC LIMIT 12",
+    )
+
+AI_KEYWORD_SEARCH = Statement(
+    "ai_keyword_search",
+    ["text"],
+    f"SELECT {ARTICLE_COLUMNS} {ARTICLE_JOINS} "
+    "WHERE a.is_active = true AND (LOWER(a.title) LIKE LOWER($1) OR LOWER(a.tags_csv) LIKE LOWER($1)) "
+    "ORDER BY a.total_view DESC LIMIT 12",
+)
+
+PROVINCE_TOP_ARTICLES = Statement(
+    "province_top_articles",
+    ["integer"],
+    f"SELECT {ARTICLE_COLUMNS} {ARTICLE_JOINS} "
+    "WHERE a.is_active = true AND a.id_province = $1 ORDER BY a.total_view DESC LIMIT 8",
+)
+
+ARTICLE_DETAIL = Statement(
+    "article_detail",
+    ["integer"],
+    f"SELECT {ARTICLE_COLUMNS}, a.video_url {ARTICLE_JOINS} WHERE a.id = $1 AND a.is_active = true",
+)
+
+STATEMENTS = {
+    statement.name: statement
+    for statement in itertools.chain(
+        ARTICLE_LIST.values(),
+        ARTICLE_COUNT.values(),
+        AI_SEARCH.values(),
+        [AI_KEYWORD_SEARCH, PROVINCE_TOP_ARTICLES, ARTICLE_DETAIL],
+    )
+}
+
+
+def article_filters(province_id=None, category_id=None, is_video=None, search=None):
+    """Return the active ARTICLE_FILTERS keys and their parameters"""
+    active = []
+    params = []
+    if province_id:
+        active.append("province")
+        params.append(province_id)
+    if category_id:
+        active.append("category")
+        params.append(category_id)
+    if is_video is not None:
+        active.append("video")
+        params.append(is_video)
+    if search:
+        active.append("search")
+        params.append(f"%{search}%")
+    return tuple(active), params
+
+
+def ai_search_filters(province=None, category=None, is_video=None):
+    """Return the active AI_SEARCH_FILTERS keys and their parameters"""
+    active = []
+    params = []
+    if province:
+        active.append("province")
+        params.append(f"%{province}%")
+    if category:
+        active.append("category")
+        params.append(f"%{category}%")
+    if is_video is not None:
+        active.append("video")
+        params.append(is_video)
+    return tuple(active), params
+
+
+def article_list_statement(filters, sort_by):
+    """Return the ARTICLE_LIST statement, sorting by most recent for unknown sort_by values"""
+    if sort_by not in SORT_ORDERS:
+        sort_by = "recent"
+    return ARTICLE_LIST[filters, sort_by]
+
+
+# Per-statement counters, shared by all pooled connections
+_stats_lock = threading.Lock()
+_prepare_counts = Counter()
+_execute_counts = Counter()
+
+
+def execute(cur, statement, params=()):
+    """Prepare the statement on this connection if needed, then EXECUTE it"""
+    conn = cur.connection
+    if statement.name not in conn.prepared_statements:
+        cur.execute(statement.prepare_sql)
+        conn.prepared_statements.add(statement.name)
+        with _stats_lock:
+            _prepare_counts[statement.name] += 1
+    cur.execute(statement.execute_sql, list(params))
+    with _stats_lock:
+        _execute_counts[statement.name] += 1
+
+
+def statement_stats():
+    """Prepare and execution counts for every statement used so far"""
+    with _stats_lock:
+        return {
+            name: {"prepares": _prepare_counts[name], "executions": _execute_counts[name]}
+            for name in sorted(set(_prepare_counts) | set(_execute_counts))
+        }
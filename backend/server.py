@@ -8,22 +8,54 @@ from pydantic import BaseModel
 from typing import List, Optional
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+from contextlib import contextmanager
 from openai import OpenAI
 import json
+import queries
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # PostgreSQL connection
+DB_SETTINGS = {
+    "host": os.environ.get('PG_HOST'),
+    "port": os.environ.get('PG_PORT'),
+    "database": os.environ.get('PG_DATABASE'),
+    "user": os.environ.get('PG_USER'),
+    "password": os.environ.get('PG_PASSWORD'),
+}
+
 def get_db_connection():
-    return psycopg2.connect(
-        host=os.environ.get('PG_HOST'),
-        port=os.environ.get('PG_PORT'),
-        database=os.environ.get('PG_DATABASE'),
-        user=os.environ.get('PG_USER'),
-        password=os.environ.get('PG_PASSWORD'),
-        cursor_factory=RealDictCursor
-    )
+    return psycopg2.connect(**DB_SETTINGS, cursor_factory=RealDictCursor)
+
+# Pooled connections keep their prepared statements between requests.
+# The pool only holds on to PG_POOL_MIN idle connections, so size it to the
+# usual concurrency or extra connections are closed along with their plans.
+db_pool = None
+
+def get_db_pool():
+    global db_pool
+    if db_pool is None:
+        db_pool = ThreadedConnectionPool(
+            int(os.environ.get('PG_POOL_MIN', 4)),
+            int(os.environ.get('PG_POOL_MAX', 10)),
+            **DB_SETTINGS,
+            connection_factory=queries.PreparedConnection,
+            cursor_factory=RealDictCursor
+        )
+    return db_pool
+
+@contextmanager
+def pooled_cursor():
+    """Borrow a pooled connection and yield a cursor on it"""
+    pool = get_db_pool()
+    conn = pool.getconn()
+    try:
+        with conn.cursor() as cur:
+            yield cur
+    finally:
+        pool.putconn(conn)
 
 # OpenAI client
 openai_client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
@@ -173,54 +205,12 @@ async def get_articles(
     offset: int = 0
 ):
     """Get articles with filters"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    query = """
-        SELECT a.id, a.title, a.thumbnail, a.is_video, a.total_view,
-               p.name as province_name, c.name as city_name, 
-               a.tags_csv as tags, a.posting_date, cat.label as category,
-               COALESCE((SELECT SUM(total_download) FROM "ArticleContentImage" WHERE id_article = a.id), 0) as total_download
-        FROM "Article" a
-        LEFT JOIN "Province" p ON a.id_province = p.id
-        LEFT JOIN "City" c ON a.id_city = c.id
-        LEFT JOIN "Category" cat ON a.id_category = cat.id
-        WHERE a.is_active = true
-    """
-    params = []
-    
-    if province_id:
-        query += " AND a.id_province = %s"
-        params.append(province_id)
-    
-    if category_id:
-        query += " AND a.id_category = %s"
-        params.append(category_id)
+    filters, params = queries.article_filters(province_id, category_id, is_video, search)
     
-    if is_video is not None:
-        query += " AND a.is_video = %s"
-        params.append(is_video)
-    
-    if search:
-        query += " AND (LOWER(a.title) LIKE LOWER(%s) OR LOWER(a.tags_csv) LIKE LOWER(%s))"
-        search_param = f"%{search}%"
-        params.extend([search_param, search_param])
-    
-    if sort_by == "popular":
-        query += " ORDER BY a.total_view DESC"
-    elif sort_by == "downloads":
-        query += " ORDER BY total_download DESC"
-    else:
-        query += " ORDER BY a.posting_date DESC"
-    
-    query += " LIMIT %s OFFSET %s"
-    params.extend([limit, offset])
-    
-    cur.execute(query, params)
-    articles = cur.fetchall()
+    with pooled_cursor() as cur:
+        queries.execute(cur, queries.article_list_statement(filters, sort_by), params + [limit, offset])
+        articles = cur.fetchall()
     
-    cur.close()
-    conn.close()
     return articles
 
 @api_router.get("/articles/paginated", response_model=ArticlesResponse)
@@ -234,64 +224,17 @@ async def get_articles_paginated(
     offset: int = 0
 ):
     """Get articles with pagination info"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    # Build WHERE clause
-    where_clause = "WHERE a.is_active = true"
-    params = []
-    
-    if province_id:
-        where_clause += " AND a.id_province = %s"
-        params.append(province_id)
+    filters, params = queries.article_filters(province_id, category_id, is_video, search)
     
-    if category_id:
-        where_clause += " AND a.id_category = %s"
-        params.append(category_id)
-    
-    if is_video is not None:
-        where_clause += " AND a.is_video = %s"
-        params.append(is_video)
-    
-    if search:
-        where_clause += " AND (LOWER(a.title) LIKE LOWER(%s) OR LOWER(a.tags_csv) LIKE LOWER(%s))"
-        search_param = f"%{search}%"
-        params.extend([search_param, search_param])
-    
-    # Get total count
-    count_query = f'SELECT COUNT(*) as total FROM "Article" a {where_clause}'
-    cur.execute(count_query, params)
-    count_result = cur.fetchone()
-    total = count_result['total'] if count_result else 0
-    
-    # Get articles
-    query = f"""
-        SELECT a.id, a.title, a.thumbnail, a.is_video, a.total_view,
-               p.name as province_name, c.name as city_name, 
-               a.tags_csv as tags, a.posting_date, cat.label as category,
-               COALESCE((SELECT SUM(total_download) FROM "ArticleContentImage" WHERE id_article = a.id), 0) as total_download
-        FROM "Article" a
-        LEFT JOIN "Province" p ON a.id_province = p.id
-        LEFT JOIN "City" c ON a.id_city = c.id
-        LEFT JOIN "Category" cat ON a.id_category = cat.id
-        {where_clause}
-    """
-    
-    if sort_by == "popular":
-        query += " ORDER BY a.total_view DESC"
-    elif sort_by == "downloads":
-        query += " ORDER BY total_download DESC"
-    else:
-        query += " ORDER BY a.posting_date DESC"
-    
-    query += " LIMIT %s OFFSET %s"
-    params.extend([limit, offset])
-    
-    cur.execute(query, params)
-    articles = cur.fetchall()
-    
-    cur.close()
-    conn.close()
+    with pooled_cursor() as cur:
+        # Get total count
+        queries.execute(cur, queries.ARTICLE_COUNT[filters], params)
+        count_result = cur.fetchone()
+        total = count_result['total'] if count_result else 0
+        
+        # Get articles
+        queries.execute(cur, queries.article_list_statement(filters, sort_by), params + [limit, offset])
+        articles = cur.fetchall()
     
     has_more = (offset + len(articles)) < total
     
@@ -300,55 +243,39 @@ async def get_articles_paginated(
 @api_router.get("/articles/{article_id}", response_model=ArticleDetail)
 async def get_article_detail(article_id: int):
     """Get article detail with content and images"""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    
-    # Get article
-    cur.execute("""
-        SELECT a.id, a.title, a.thumbnail, a.is_video, a.video_url, a.total_view,
-               p.name as province_name, c.name as city_name, 
-               a.tags_csv as tags, a.posting_date, cat.label as category
-        FROM "Article" a
-        LEFT JOIN "Province" p ON a.id_province = p.id
-        LEFT JOIN "City" c ON a.id_city = c.id
-        LEFT JOIN "Category" cat ON a.id_category = cat.id
-        WHERE a.id = %s AND a.is_active = true
-    """, [article_id])
-    
-    article = cur.fetchone()
-    if not article:
-        cur.close()
-        conn.close()
-        raise HTTPException(status_code=404, detail="Article not found")
-    
-    # Get content
-    cur.execute("""
-        SELECT content FROM "ArticleContent" WHERE id_article = %s
-    """, [article_id])
-    content_row = cur.fetchone()
-    content = content_row['content'] if content_row else None
-    
-    # Get images
-    cur.execute("""
-        SELECT id, thumbnail, image_url, total_download
-        FROM "ArticleContentImage" WHERE id_article = %s
-    """, [article_id])
-    images = cur.fetchall()
-    
-    # Calculate total downloads for this article
-    cur.execute("""
-        SELECT COALESCE(SUM(total_download), 0) as total FROM "ArticleContentImage" WHERE id_article = %s
-    """, [article_id])
-    total_download = cur.fetchone()['total']
-    
-    # Increment view count
-    cur.execute("""
-        UPDATE "Article" SET total_view = total_view + 1 WHERE id = %s
-    """, [article_id])
-    conn.commit()
-    
-    cur.close()
-    conn.close()
+    with pooled_cursor() as cur:
+        # Get article
+        queries.execute(cur, queries.ARTICLE_DETAIL, [article_id])
+        
+        article = cur.fetchone()
+        if not article:
+            raise HTTPException(status_code=404, detail="Article not found")
+        
+        # Get content
+        cur.execute("""
+            SELECT content FROM "ArticleContent" WHERE id_article = %s
+        """, [article_id])
+        content_row = cur.fetchone()
+        content = content_row['content'] if content_row else None
+        
+        # Get images
+        cur.execute("""
+            SELECT id, thumbnail, image_url, total_download
+            FROM "ArticleContentImage" WHERE id_article = %s
+        """, [article_id])
+        images = cur.fetchall()
+        
+        # Calculate total downloads for this article
+        cur.execute("""
+            SELECT COALESCE(SUM(total_download), 0) as total FROM "ArticleContentImage" WHERE id_article = %s
+        """, [article_id])
+        total_download = cur.fetchone()['total']
+        
+        # Increment view count
+        cur.execute("""
+            UPDATE "Article" SET total_view = total_view + 1 WHERE id = %s
+        """, [article_id])
+        cur.connection.commit()
     
     return {
         **dict(article),
@@ -483,19 +410,22 @@ async def get_stats():
             "total_downloads": 0
         }
 
+@api_router.get("/stats/queries")
+async def get_query_stats():
+    """Get prepare and execution counts per prepared statement"""
+    return queries.statement_stats()
+
 @api_router.post("/ai/search")
 async def ai_search(request: SearchRequest):
     """AI-powered natural language search"""
     try:
         # Get all provinces and categories for context
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        cur.execute("SELECT name FROM \"Province\"")
-        provinces = [row['name'] for row in cur.fetchall()]
-        
-        cur.execute("SELECT label FROM \"Category\"")
-        categories = [row['label'] for row in cur.fetchall()]
+        with pooled_cursor() as cur:
+            cur.execute("SELECT name FROM \"Province\"")
+            provinces = [row['name'] for row in cur.fetchall()]
+            
+            cur.execute("SELECT label FROM \"Category\"")
+            categories = [row['label'] for row in cur.fetchall()]
         
         # Use AI to understand the query
         system_prompt = f"""Kamu adalah asisten pencarian wisata Indonesia. 
@@ -521,58 +451,18 @@ Jawab dalam format JSON:
         ai_result = json.loads(response.choices[0].message.content)
         
         # Build search query - prioritize province match
-        query = """
-            SELECT a.id, a.title, a.thumbnail, a.is_video, a.total_view,
-                   p.name as province_name, c.name as city_name, 
-                   a.tags_csv as tags, a.posting_date, cat.label as category
-            FROM "Article" a
-            LEFT JOIN "Province" p ON a.id_province = p.id
-            LEFT JOIN "City" c ON a.id_city = c.id
-            LEFT JOIN "Category" cat ON a.id_category = cat.id
-            WHERE a.is_active = true
-        """
-        params = []
-        has_filter = False
-        
-        if ai_result.get('province'):
-            query += " AND LOWER(p.name) LIKE LOWER(%s)"
-            params.append(f"%{ai_result['province']}%")
-            has_filter = True
-        
-        if ai_result.get('category'):
-            query += " AND LOWER(cat.label) LIKE LOWER(%s)"
-            params.append(f"%{ai_result['category']}%")
-            has_filter = True
-        
-        if ai_result.get('is_video') is not None:
-            query += " AND a.is_video = %s"
-            params.append(ai_result['is_video'])
-        
-        query += " ORDER BY a.total_view DESC LIMIT 12"
-        
-        cur.execute(query, params)
-        articles = cur.fetchall()
+        filters, params = queries.ai_search_filters(
+            ai_result.get('province'), ai_result.get('category'), ai_result.get('is_video')
+        )
         
-        # If no results with province filter, try keyword search
-        if len(articles) == 0 and ai_result.get('keywords'):
-            query2 = """
-                SELECT a.id, a.title, a.thumbnail, a.is_video, a.total_view,
-                       p.name as province_name, c.name as city_name, 
-                       a.tags_csv as tags, a.posting_date, cat.label as category
-                FROM "Article" a
-                LEFT JOIN "Province" p ON a.id_province = p.id
-                LEFT JOIN "City" c ON a.id_city = c.id
-                LEFT JOIN "Category" cat ON a.id_category = cat.id
-                WHERE a.is_active = true
-                AND (LOWER(a.title) LIKE LOWER(%s) OR LOWER(a.tags_csv) LIKE LOWER(%s))
-                ORDER BY a.total_view DESC LIMIT 12
-            """
-            keywords = f"%{ai_result['keywords']}%"
-            cur.execute(query2, [keywords, keywords])
+        with pooled_cursor() as cur:
+            queries.execute(cur, queries.AI_SEARCH[filters], params)
             articles = cur.fetchall()
-        
-        cur.close()
-        conn.close()
+            
+            # If no results with province filter, try keyword search
+            if len(articles) == 0 and ai_result.get('keywords'):
+                queries.execute(cur, queries.AI_KEYWORD_SEARCH, [f"%{ai_result['keywords']}%"])
+                articles = cur.fetchall()
         
         return {
             "interpreted_query": ai_result,
@@ -587,37 +477,18 @@ Jawab dalam format JSON:
 async def ai_recommend(province_id: int):
     """Get AI recommendations for a province"""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        
-        # Get province info
-        cur.execute("SELECT name FROM \"Province\" WHERE id = %s", [province_id])
-        province_row = cur.fetchone()
-        if not province_row:
-            cur.close()
-            conn.close()
-            raise HTTPException(status_code=404, detail="Province not found")
-        
-        province_name = province_row['name']
-        
-        # Get top articles from this province
-        cur.execute("""
-            SELECT a.id, a.title, a.thumbnail, a.is_video, a.total_view,
-                   p.name as province_name, c.name as city_name, 
-                   a.tags_csv as tags, a.posting_date, cat.label as category
-            FROM "Article" a
-            LEFT JOIN "Province" p ON a.id_province = p.id
-            LEFT JOIN "City" c ON a.id_city = c.id
-            LEFT JOIN "Category" cat ON a.id_category = cat.id
-            WHERE a.is_active = true AND a.id_province = %s
-            ORDER BY a.total_view DESC
-            LIMIT 8
-        """, [province_id])
-        
-        articles = [dict(a) for a in cur.fetchall()]
-        
-        cur.close()
-        conn.close()
+        with pooled_cursor() as cur:
+            # Get province info
+            cur.execute("SELECT name FROM \"Province\" WHERE id = %s", [province_id])
+            province_row = cur.fetchone()
+            if not province_row:
+                raise HTTPException(status_code=404, detail="Province not found")
+            
+            province_name = province_row['name']
+            
+            # Get top articles from this province
+            queries.execute(cur, queries.PROVINCE_TOP_ARTICLES, [province_id])
+            articles = [dict(a) for a in cur.fetchall()]
         
         # Generate AI recommendation
         if articles:
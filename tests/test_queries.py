@@ -0,0 +1,63 @@
+import re
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import queries  # noqa: E402
+
+
+class FakeConnection:
+    def __init__(self):
+        self.prepared_statements = set()
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+
+def test_placeholders_match_param_types():
+    for name, statement in queries.STATEMENTS.items():
+        placeholders = [int(n) for n in re.findall(r"\$(\d+)", statement.sql)]
+        assert max(placeholders, default=0) == len(statement.param_types), name
+        assert set(placeholders) == set(range(1, len(statement.param_types) + 1)), name
+        assert statement.execute_sql.count("%s") == len(statement.param_types), name
+
+
+def test_every_filter_and_sort_combination_is_registered():
+    assert len(queries.ARTICLE_COUNT) == 2 ** len(queries.ARTICLE_FILTERS)
+    assert len(queries.ARTICLE_LIST) == len(queries.ARTICLE_COUNT) * len(queries.SORT_ORDERS)
+    assert len(queries.AI_SEARCH) == 2 ** len(queries.AI_SEARCH_FILTERS)
+
+
+def test_filter_helpers_return_registered_keys():
+    filters, params = queries.article_filters(3, None, False, "pantai")
+    assert filters == ("province", "video", "search")
+    assert params == [3, False, "%pantai%"]
+    assert queries.article_list_statement(filters, "popular") is queries.ARTICLE_LIST[filters, "popular"]
+    assert queries.article_list_statement(filters, "foo") is queries.ARTICLE_LIST[filters, "recent"]
+
+    filters, params = queries.ai_search_filters("BALI", None, True)
+    assert filters == ("province", "video")
+    assert params == ["%BALI%", True]
+    assert filters in queries.AI_SEARCH
+
+
+def test_execute_prepares_once_per_connection():
+    statement = queries.Statement("test_prepare_once", ["integer"], "SELECT $1")
+    cur = FakeCursor(FakeConnection())
+
+    queries.execute(cur, statement, [1])
+    queries.execute(cur, statement, [2])
+
+    assert cur.executed == [
+        ("PREPARE test_prepare_once (integer) AS SELECT $1", None),
+        ("EXECUTE test_prepare_once (%s)", [1]),
+        ("EXECUTE test_prepare_once (%s)", [2]),
+    ]
+    assert queries.statement_stats()["test_prepare_once"] == {"prepares": 1, "executions": 2}